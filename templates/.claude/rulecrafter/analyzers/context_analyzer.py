@@ -5,13 +5,76 @@ Analyzes codebase context and git diffs to understand project state and changes.
 """
 
 import json
+import mmap
 import os
 import sys
 import subprocess
 import re
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+from bisect import bisect_right
+from stat import S_ISREG
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from itertools import chain
+
+# _jsonio.py lives one directory up, beside analyzers/ and generators/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _jsonio import loads as _loads, dumps as _dumps
+
+# Common error patterns, compiled once at import time. They are scanned one
+# after another, so a line can count as several error types.
+_ERROR_PATTERNS = tuple(
+    (re.compile(pattern, re.MULTILINE | re.IGNORECASE), error_type)
+    for pattern, error_type in [
+        (r'Error: (.+)', 'generic_error'),
+        (r'TypeError: (.+)', 'type_error'),
+        (r'SyntaxError: (.+)', 'syntax_error'),
+        (r'TS\d+: (.+)', 'typescript_error'),
+        (r'ESLint: (.+)', 'eslint_error'),
+        (r'npm ERR! (.+)', 'npm_error'),
+        (r'FAIL (.+)', 'test_failure'),
+        (r'Cannot find module (.+)', 'module_not_found'),
+        (r'Permission denied (.+)', 'permission_error'),
+    ]
+)
+
+# File size buckets: below 1000 bytes is small, below 10000 medium, else large
+_SIZE_BOUNDS = (1000, 10000)
+_SIZE_NAMES = ('small', 'medium', 'large')
+
+# Worker threads used to stat and scan changed files, for diffs large enough
+# that the pool's startup cost pays off; smaller diffs are handled inline
+_MAX_WORKERS = 8
+_PARALLEL_MIN_FILES = 256
+
+# Code files up to this size are read with one read() call; larger ones are mapped
+_READ_LIMIT = 256 * 1024
+
+# Windows needs O_BINARY so os.read() returns the raw bytes
+_O_BINARY = getattr(os, 'O_BINARY', 0)
+
+# Code features counted by _analyze_code_file, with the byte strings that signal
+# each one. Test markers are matched case-insensitively, see _has_test_marker.
+_CODE_FEATURE_NEEDLES = (
+    ('has_imports', (b'import', b'from')),
+    ('has_functions', (b'function', b'def ')),
+    ('has_classes', (b'class ',)),
+)
+_TEST_MARKERS = (b'test', b'spec')
+
+# A compaction lock older than this many seconds was left by a crashed run
+_LOCK_STALE_SECONDS = 60
+
+# Git queries used by analyze_git_diff: unstaged files, staged files,
+# recent commits (last 5) and current branch
+_GIT_QUERIES = (
+    ['git', 'diff', '--name-only'],
+    ['git', 'diff', '--cached', '--name-only'],
+    ['git', 'log', '--oneline', '-5'],
+    ['git', 'branch', '--show-current'],
+)
 
 class ContextAnalyzer:
     def __init__(self, project_root: str):
@@ -19,6 +82,11 @@ class ContextAnalyzer:
         self.rulecrafter_dir = self.project_root / '.claude' / 'rulecrafter'
         self.storage_dir = self.rulecrafter_dir / 'storage'
         self.patterns_file = self.storage_dir / 'patterns.json'
+        self.events_file = self.storage_dir / 'patterns.jsonl'
+        self.lock_file = self.storage_dir / 'patterns.json.lock'
+        
+        # Fold the event log into the patterns file after this many sessions
+        self.compact_every = 10
         
         # Ensure storage directory exists
         self.storage_dir.mkdir(parents=True, exist_ok=True)
@@ -29,7 +97,12 @@ class ContextAnalyzer:
     
     def _initialize_patterns_file(self):
         """Initialize the patterns.json file with default structure."""
-        initial_patterns = {
+        self._write_patterns(self._initial_patterns(), indent=True)
+    
+    @staticmethod
+    def _initial_patterns() -> Dict[str, Any]:
+        """Return the default, empty patterns structure."""
+        return {
             "commands": {},
             "errors": {},
             "files_changed": {},
@@ -39,50 +112,37 @@ class ContextAnalyzer:
             "total_sessions": 0,
             "confidence_scores": {}
         }
-        
-        with open(self.patterns_file, 'w') as f:
-            json.dump(initial_patterns, f, indent=2)
+    
+    def _write_patterns(self, patterns: Dict[str, Any], indent: bool = False):
+        """Write patterns to a temp file and swap it into place in one step."""
+        tmp_file = self.storage_dir / f'patterns.json.tmp.{os.getpid()}'
+        tmp_file.write_bytes(_dumps(patterns, indent))
+        os.replace(tmp_file, self.patterns_file)
     
     def analyze_git_diff(self) -> Dict[str, Any]:
         """Analyze recent git changes to understand what's being worked on."""
         try:
-            # Get unstaged changes
-            unstaged = subprocess.run(
-                ['git', 'diff', '--name-only'],
-                cwd=self.project_root,
-                capture_output=True,
-                text=True
-            )
-            
-            # Get staged changes
-            staged = subprocess.run(
-                ['git', 'diff', '--cached', '--name-only'],
-                cwd=self.project_root,
-                capture_output=True,
-                text=True
-            )
-            
-            # Get recent commits (last 5)
-            recent_commits = subprocess.run(
-                ['git', 'log', '--oneline', '-5'],
-                cwd=self.project_root,
-                capture_output=True,
-                text=True
-            )
-            
-            # Get current branch
-            current_branch = subprocess.run(
-                ['git', 'branch', '--show-current'],
-                cwd=self.project_root,
-                capture_output=True,
-                text=True
+            # Start every git query up front so the processes run concurrently,
+            # then collect their output in order
+            processes = [
+                subprocess.Popen(
+                    command,
+                    cwd=self.project_root,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True
+                )
+                for command in _GIT_QUERIES
+            ]
+            unstaged, staged, recent_commits, current_branch = (
+                process.communicate()[0] for process in processes
             )
             
             return {
-                'unstaged_files': unstaged.stdout.strip().split('\n') if unstaged.stdout.strip() else [],
-                'staged_files': staged.stdout.strip().split('\n') if staged.stdout.strip() else [],
-                'recent_commits': recent_commits.stdout.strip().split('\n') if recent_commits.stdout.strip() else [],
-                'current_branch': current_branch.stdout.strip(),
+                'unstaged_files': unstaged.strip().split('\n') if unstaged.strip() else [],
+                'staged_files': staged.strip().split('\n') if staged.strip() else [],
+                'recent_commits': recent_commits.strip().split('\n') if recent_commits.strip() else [],
+                'current_branch': current_branch.strip(),
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -92,140 +152,262 @@ class ContextAnalyzer:
                 'timestamp': datetime.now().isoformat()
             }
     
-    def analyze_file_patterns(self, files: List[str]) -> Dict[str, Any]:
+    def analyze_file_patterns(self, files: Iterable[str]) -> Dict[str, Any]:
         """Analyze patterns in the files being changed."""
         patterns = {
-            'file_types': {},
-            'directories': {},
+            'file_types': Counter(),
+            'directories': Counter(),
             'naming_patterns': [],
-            'size_indicators': {}
+            'size_indicators': Counter()
         }
         
-        for file_path in files:
-            if not file_path:
-                continue
-                
-            # File extension analysis
-            ext = Path(file_path).suffix.lower()
-            patterns['file_types'][ext] = patterns['file_types'].get(ext, 0) + 1
-            
-            # Directory analysis
-            directory = str(Path(file_path).parent)
-            patterns['directories'][directory] = patterns['directories'].get(directory, 0) + 1
-            
-            # Check if file exists and analyze it
-            full_path = self.project_root / file_path
-            if full_path.exists() and full_path.is_file():
-                try:
-                    # File size analysis
-                    size = full_path.stat().st_size
-                    if size < 1000:
-                        patterns['size_indicators']['small'] = patterns['size_indicators'].get('small', 0) + 1
-                    elif size < 10000:
-                        patterns['size_indicators']['medium'] = patterns['size_indicators'].get('medium', 0) + 1
-                    else:
-                        patterns['size_indicators']['large'] = patterns['size_indicators'].get('large', 0) + 1
-                    
-                    # Basic content analysis for common patterns
-                    if ext in ['.py', '.js', '.ts', '.jsx', '.tsx']:
-                        self._analyze_code_file(full_path, patterns)
-                        
-                except (OSError, PermissionError):
-                    continue
+        # Materialize the non-empty paths once; the pool threshold needs a count
+        files = [file_path for file_path in files if file_path]
+        
+        # Stat and scan files, concurrently for large diffs; results come back in
+        # input order and are merged here, so the workers never share mutable state
+        if len(files) < _PARALLEL_MIN_FILES:
+            results = [self._analyze_one_file(file_path) for file_path in files]
+        else:
+            with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
+                results = list(executor.map(self._analyze_one_file, files))
+        
+        code_features = Counter()
+        for _, _, _, features in results:
+            code_features.update(features)
+        
+        patterns['file_types'].update(ext for ext, _, _, _ in results)
+        patterns['directories'].update(directory for _, directory, _, _ in results)
+        patterns['size_indicators'].update(size for _, _, size, _ in results if size)
+        patterns.update(code_features)
         
         return patterns
     
-    def _analyze_code_file(self, file_path: Path, patterns: Dict[str, Any]):
-        """Analyze code file for common patterns."""
+    def _analyze_one_file(self, file_path: str) -> Tuple[str, str, Optional[str], Tuple[str, ...]]:
+        """Analyze one changed file. Returns (ext, directory, size_bucket, code_features)."""
+        # File extension and directory analysis, using plain string operations
+        parent, name = os.path.split(file_path)
+        ext = os.path.splitext(name)[1].lower()
+        directory = parent or '.'
+        
+        # Check if file exists and analyze it; one stat call serves both the
+        # regular-file check and the size
+        full_path = self.project_root / file_path
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-                # Look for common patterns
-                if 'import' in content or 'from' in content:
-                    patterns['has_imports'] = patterns.get('has_imports', 0) + 1
-                
-                if 'function' in content or 'def ' in content:
-                    patterns['has_functions'] = patterns.get('has_functions', 0) + 1
-                
-                if 'class ' in content:
-                    patterns['has_classes'] = patterns.get('has_classes', 0) + 1
-                
-                if 'test' in content.lower() or 'spec' in content.lower():
-                    patterns['has_tests'] = patterns.get('has_tests', 0) + 1
-                    
-        except (UnicodeDecodeError, OSError):
-            pass
+            st = os.stat(full_path)
+        except OSError:
+            return ext, directory, None, ()
+        if not S_ISREG(st.st_mode):
+            return ext, directory, None, ()
+        
+        # File size analysis
+        size = st.st_size
+        size_bucket = _SIZE_NAMES[bisect_right(_SIZE_BOUNDS, size)]
+        
+        # Basic content analysis for common patterns
+        features = ()
+        if ext in ['.py', '.js', '.ts', '.jsx', '.tsx']:
+            features = self._analyze_code_file(full_path, size)
+        
+        return ext, directory, size_bucket, features
+    
+    def _analyze_code_file(self, file_path: Path, size: int) -> Tuple[str, ...]:
+        """Analyze code file for common patterns. Returns the features found."""
+        # Empty files have no features; skip opening them at all
+        if size == 0:
+            return ()
+        
+        try:
+            fd = os.open(file_path, os.O_RDONLY | _O_BINARY)
+        except OSError:
+            return ()
+        
+        try:
+            # The size is already known from the stat call, so small files
+            # take a single read() and only large ones are memory-mapped
+            if size <= _READ_LIMIT:
+                return self._scan_code_features(os.read(fd, size))
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as content:
+                return self._scan_code_features(content)
+        except (ValueError, OSError):
+            # The file shrank to nothing or vanished since it was checked
+            return ()
+        finally:
+            os.close(fd)
+    
+    def _scan_code_features(self, content) -> Tuple[str, ...]:
+        """Search file bytes (or a mapping) for each feature, stopping at its first hit."""
+        features = [
+            feature for feature, needles in _CODE_FEATURE_NEEDLES
+            if any(content.find(needle) != -1 for needle in needles)
+        ]
+        if self._has_test_marker(content):
+            features.append('has_tests')
+        
+        return tuple(features)
+    
+    @staticmethod
+    def _has_test_marker(content) -> bool:
+        """Look for a test marker in any case, lowering one slice at a time."""
+        # Slices overlap by three bytes so a marker across a boundary is still
+        # found, and a mapped file is never copied whole
+        for start in range(0, len(content), _READ_LIMIT):
+            chunk = content[start:start + _READ_LIMIT + 3].lower()
+            if any(marker in chunk for marker in _TEST_MARKERS):
+                return True
+        return False
     
     def detect_error_patterns(self, tool_output: str) -> List[Dict[str, Any]]:
         """Detect error patterns from tool output."""
         errors = []
+        now = datetime.now().isoformat()
         
-        # Common error patterns
-        error_patterns = [
-            (r'Error: (.+)', 'generic_error'),
-            (r'TypeError: (.+)', 'type_error'),
-            (r'SyntaxError: (.+)', 'syntax_error'),
-            (r'TS\d+: (.+)', 'typescript_error'),
-            (r'ESLint: (.+)', 'eslint_error'),
-            (r'npm ERR! (.+)', 'npm_error'),
-            (r'FAIL (.+)', 'test_failure'),
-            (r'Cannot find module (.+)', 'module_not_found'),
-            (r'Permission denied (.+)', 'permission_error'),
-        ]
-        
-        for pattern, error_type in error_patterns:
-            matches = re.finditer(pattern, tool_output, re.MULTILINE | re.IGNORECASE)
-            for match in matches:
+        for pattern, error_type in _ERROR_PATTERNS:
+            for match in pattern.finditer(tool_output):
                 errors.append({
                     'type': error_type,
                     'message': match.group(1).strip(),
                     'full_match': match.group(0),
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': now
                 })
         
         return errors
     
     def update_patterns(self, context_data: Dict[str, Any]):
-        """Update the patterns file with new context data."""
+        """Record new context data, compacting the event log every few sessions."""
         try:
-            # Load existing patterns
-            with open(self.patterns_file, 'r') as f:
-                patterns = json.load(f)
+            # Append a single event instead of rewriting the whole patterns file
+            with open(self.events_file, 'ab+') as f:
+                f.write(_dumps(context_data) + b'\n')
+                
+                # Count only as far as the threshold, so a log that could not be
+                # compacted is never read in full on every append
+                f.seek(0)
+                pending_events = 0
+                for _ in f:
+                    pending_events += 1
+                    if pending_events >= self.compact_every:
+                        break
             
-            # Update with new data
-            patterns['last_updated'] = datetime.now().isoformat()
-            patterns['total_sessions'] = patterns.get('total_sessions', 0) + 1
+            if pending_events >= self.compact_every:
+                self.compact()
+                
+        except OSError as e:
+            print(f"Error updating patterns: {e}", file=sys.stderr)
+    
+    def compact(self) -> int:
+        """Fold pending events into the patterns file. Returns the number folded."""
+        # Only the process holding the lock reads, folds and rewrites patterns.json;
+        # any other process leaves its events in the log for the next compaction
+        if not self._acquire_lock():
+            return 0
+        
+        try:
+            return self._compact_locked()
+        finally:
+            self._release_lock()
+    
+    def _acquire_lock(self) -> bool:
+        """Create the compaction lock file exclusively, breaking a stale one once."""
+        for _ in range(2):
+            try:
+                os.close(os.open(self.lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    age = datetime.now().timestamp() - self.lock_file.stat().st_mtime
+                    if age < _LOCK_STALE_SECONDS:
+                        return False
+                    self.lock_file.unlink()
+                except FileNotFoundError:
+                    pass  # Released meanwhile; try again
+            except OSError as e:
+                print(f"Error compacting patterns: {e}", file=sys.stderr)
+                return False
+        return False
+    
+    def _release_lock(self):
+        """Remove the compaction lock file."""
+        try:
+            self.lock_file.unlink()
+        except FileNotFoundError:
+            pass
+    
+    def _compact_locked(self) -> int:
+        """Fold the claimed event log into patterns.json. The caller holds the lock."""
+        # Claim the event log first so concurrent appends start a fresh one.
+        # A claim left behind by an interrupted run is folded before a new one.
+        claimed_file = self.storage_dir / 'patterns.jsonl.compacting'
+        try:
+            if not claimed_file.exists():
+                os.replace(self.events_file, claimed_file)
+        except FileNotFoundError:
+            return 0
+        
+        try:
+            try:
+                patterns = _loads(self.patterns_file.read_bytes())
+            except (json.JSONDecodeError, FileNotFoundError):
+                # Set an unreadable file aside and start over, rather than
+                # holding the claim (and growing the log) until someone fixes it
+                if self.patterns_file.exists():
+                    os.replace(self.patterns_file, self.storage_dir / 'patterns.json.corrupt')
+                    print("Warning: patterns.json was unreadable; moved to patterns.json.corrupt",
+                          file=sys.stderr)
+                patterns = self._initial_patterns()
             
-            # Update git patterns
-            if 'git_diff' in context_data:
-                git_data = context_data['git_diff']
-                for file in git_data.get('unstaged_files', []) + git_data.get('staged_files', []):
-                    if file:
-                        patterns['files_changed'][file] = patterns['files_changed'].get(file, 0) + 1
+            folded = 0
+            with open(claimed_file, 'rb') as f:
+                for line in f:
+                    try:
+                        event = _loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Skip a line truncated by an interrupted write
+                    self._merge_context(patterns, event)
+                    folded += 1
             
-            # Update error patterns
-            if 'errors' in context_data:
-                for error in context_data['errors']:
-                    error_key = f"{error['type']}:{error['message'][:50]}"
-                    patterns['errors'][error_key] = patterns['errors'].get(error_key, 0) + 1
+            self._write_patterns(patterns)
+            claimed_file.unlink()
             
-            # Update file patterns
-            if 'file_patterns' in context_data:
-                file_patterns = context_data['file_patterns']
-                for key, value in file_patterns.items():
-                    if isinstance(value, dict):
-                        if key not in patterns:
-                            patterns[key] = {}
-                        for sub_key, count in value.items():
-                            patterns[key][sub_key] = patterns[key].get(sub_key, 0) + count
+            return folded
             
-            # Save updated patterns
-            with open(self.patterns_file, 'w') as f:
-                json.dump(patterns, f, indent=2)
-                
-        except (json.JSONDecodeError, OSError) as e:
-            print(f"Error updating patterns: {e}", file=sys.stderr)
+        except OSError as e:
+            print(f"Error compacting patterns: {e}", file=sys.stderr)
+            return 0
+    
+    def _merge_context(self, patterns: Dict[str, Any], context_data: Dict[str, Any]):
+        """Merge one context event into the loaded patterns."""
+        patterns['last_updated'] = context_data.get('timestamp') or datetime.now().isoformat()
+        patterns['total_sessions'] = patterns.get('total_sessions', 0) + 1
+        
+        # Update git patterns
+        if 'git_diff' in context_data:
+            git_data = context_data['git_diff']
+            self._counter(patterns, 'files_changed').update(
+                file for file in chain(git_data.get('unstaged_files', ()), git_data.get('staged_files', ()))
+                if file
+            )
+        
+        # Update error patterns
+        if 'errors' in context_data:
+            self._counter(patterns, 'errors').update(
+                f"{error['type']}:{error['message'][:50]}" for error in context_data['errors']
+            )
+        
+        # Update file patterns
+        if 'file_patterns' in context_data:
+            file_patterns = context_data['file_patterns']
+            for key, value in file_patterns.items():
+                if isinstance(value, dict):
+                    self._counter(patterns, key).update(value)
+    
+    @staticmethod
+    def _counter(patterns: Dict[str, Any], key: str) -> Counter:
+        """Return patterns[key] as a Counter, converting the loaded dict once."""
+        counter = patterns.get(key)
+        if not isinstance(counter, Counter):
+            counter = patterns[key] = Counter(counter or {})
+        return counter
     
     def analyze_context(self, tool_name: str = None, tool_args: List[str] = None, 
                        tool_output: str = None) -> Dict[str, Any]:
@@ -241,14 +423,11 @@ class ContextAnalyzer:
         context['git_diff'] = self.analyze_git_diff()
         
         # Analyze file patterns from git changes
-        all_files = []
-        if 'unstaged_files' in context['git_diff']:
-            all_files.extend(context['git_diff']['unstaged_files'])
-        if 'staged_files' in context['git_diff']:
-            all_files.extend(context['git_diff']['staged_files'])
+        unstaged_files = context['git_diff'].get('unstaged_files', [])
+        staged_files = context['git_diff'].get('staged_files', [])
         
-        if all_files:
-            context['file_patterns'] = self.analyze_file_patterns(all_files)
+        if unstaged_files or staged_files:
+            context['file_patterns'] = self.analyze_file_patterns(chain(unstaged_files, staged_files))
         
         # Analyze errors in tool output
         if tool_output:
@@ -263,9 +442,16 @@ def main():
     """Main entry point when called as a script."""
     if len(sys.argv) < 2:
         print("Usage: python context_analyzer.py <project_root> [tool_name] [tool_output_file]")
+        print("       python context_analyzer.py <project_root> --compact")
         sys.exit(1)
     
     project_root = sys.argv[1]
+    
+    if '--compact' in sys.argv[2:]:
+        analyzer = ContextAnalyzer(project_root)
+        print(json.dumps({'compacted_events': analyzer.compact()}, indent=2))
+        return
+    
     tool_name = sys.argv[2] if len(sys.argv) > 2 else None
     tool_output_file = sys.argv[3] if len(sys.argv) > 3 else None
     
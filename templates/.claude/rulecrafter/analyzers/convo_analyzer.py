@@ -10,9 +10,65 @@ import sys
 import re
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any
 from collections import Counter
 
+# _jsonio.py lives one directory up, beside analyzers/ and generators/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _jsonio import loads as _loads, dumps as _dumps
+
+# Pattern to match slash commands: /command-name or /command_name
+_SLASH_RX = re.compile(r'/[a-zA-Z][a-zA-Z0-9_-]*')
+
+# Lowercase substrings that mark a line as an error message
+_ERROR_INDICATORS = (
+    'error:', 'failed:', 'exception:', 'traceback:', 'syntax error', 'type error',
+    'command not found', 'permission denied', 'npm err!', 'fail:',
+)
+
+# Common tool patterns in priority order, compiled once at import time. The
+# first pattern that matches a line decides its tool type, wherever it matches.
+_TOOL_PATTERNS = tuple(
+    (re.compile(pattern, re.IGNORECASE), tool_type)
+    for pattern, tool_type in [
+        (r'running.*?`([^`]+)`', 'shell_command'),
+        (r'executing.*?`([^`]+)`', 'shell_command'),
+        (r'editing.*?file.*?`([^`]+)`', 'file_edit'),
+        (r'creating.*?file.*?`([^`]+)`', 'file_create'),
+        (r'reading.*?file.*?`([^`]+)`', 'file_read'),
+        (r'git\s+([a-zA-Z]+)', 'git_command'),
+        (r'npm\s+([a-zA-Z]+)', 'npm_command'),
+        (r'python\s+([^\s]+)', 'python_script'),
+        (r'node\s+([^\s]+)', 'node_script'),
+    ]
+)
+
+# Line prefixes that mark system output rather than a user prompt
+_SYSTEM_PREFIXES = (
+    '>', '$ ', '+ ', '- ', '* ',
+    'INFO:', 'DEBUG:', 'WARN:', 'ERROR:',
+    'npm ', 'git ', 'python ', 'node ',
+    'Running', 'Executing', 'Creating', 'Editing',
+)
+
+# Lowercase question words and request patterns that suggest a user prompt
+_PROMPT_INDICATORS = (
+    'can you', 'please', 'how do', 'what is', 'why does',
+    'help me', 'i need', 'could you', 'would you',
+    'create', 'make', 'build', 'implement', 'fix', 'debug',
+)
+
+# Prompt intents in priority order, each with the lowercase words that signal it
+_PROMPT_CATEGORIES = (
+    ('code_creation', ('create', 'make', 'build', 'implement', 'write', 'add')),
+    ('debugging', ('debug', 'fix', 'error', 'bug', 'issue', 'problem')),
+    ('refactoring', ('refactor', 'improve', 'optimize', 'clean', 'restructure')),
+    ('testing', ('test', 'spec', 'unit', 'integration', 'e2e')),
+    ('documentation', ('document', 'comment', 'readme', 'docs', 'explain')),
+    ('explanation', ('what', 'why', 'how', 'explain', 'understand')),
+    ('configuration', ('config', 'setup', 'install', 'configure', 'setting')),
+)
+
 class ConversationAnalyzer:
     def __init__(self, project_root: str):
         self.project_root = Path(project_root)
@@ -25,15 +81,6 @@ class ConversationAnalyzer:
     
     def parse_session_log(self, log_content: str) -> Dict[str, Any]:
         """Parse Claude Code session log content."""
-        session_data = {
-            'commands_used': [],
-            'slash_commands': [],
-            'error_messages': [],
-            'user_prompts': [],
-            'tool_calls': [],
-            'timestamp': datetime.now().isoformat()
-        }
-        
         try:
             # If it's JSON format from --output-format json
             if log_content.strip().startswith('{'):
@@ -49,13 +96,14 @@ class ConversationAnalyzer:
     
     def _parse_json_session(self, json_data: Dict[str, Any]) -> Dict[str, Any]:
         """Parse JSON-formatted session data."""
+        now = datetime.now().isoformat()
         session_data = {
             'commands_used': [],
             'slash_commands': [],
             'error_messages': [],
             'user_prompts': [],
             'tool_calls': [],
-            'timestamp': datetime.now().isoformat()
+            'timestamp': now
         }
         
         # Extract tool calls
@@ -82,34 +130,39 @@ class ConversationAnalyzer:
     
     def _parse_text_session(self, log_content: str) -> Dict[str, Any]:
         """Parse plain text session logs."""
+        now = datetime.now().isoformat()
         session_data = {
             'commands_used': [],
             'slash_commands': [],
             'error_messages': [],
             'user_prompts': [],
             'tool_calls': [],
-            'timestamp': datetime.now().isoformat()
+            'timestamp': now
         }
         
-        lines = log_content.split('\n')
+        # Slash commands never span lines, so one pass over the whole log suffices
+        session_data['slash_commands'] = self._extract_slash_commands(log_content)
         
-        for line in lines:
+        for line in log_content.split('\n'):
             line = line.strip()
             if not line:
                 continue
             
-            # Look for slash commands
-            slash_commands = self._extract_slash_commands(line)
-            session_data['slash_commands'].extend(slash_commands)
-            
             # Look for error patterns
             if self._is_error_line(line):
                 session_data['error_messages'].append(line)
             
             # Look for tool usage patterns
-            tool_usage = self._extract_tool_usage(line)
-            if tool_usage:
-                session_data['tool_calls'].append(tool_usage)
+            for pattern, tool_type in _TOOL_PATTERNS:
+                tool_match = pattern.search(line)
+                if tool_match:
+                    session_data['tool_calls'].append({
+                        'type': tool_type,
+                        'command': tool_match.group(1),
+                        'full_line': line,
+                        'timestamp': now
+                    })
+                    break
             
             # Collect user prompts (simple heuristic)
             if self._looks_like_user_prompt(line):
@@ -119,54 +172,12 @@ class ConversationAnalyzer:
     
     def _extract_slash_commands(self, text: str) -> List[str]:
         """Extract slash commands from text."""
-        # Pattern to match slash commands: /command-name or /command_name
-        pattern = r'/([a-zA-Z][a-zA-Z0-9_-]*)'
-        matches = re.findall(pattern, text)
-        return [f"/{match}" for match in matches]
+        return _SLASH_RX.findall(text)
     
     def _is_error_line(self, line: str) -> bool:
         """Check if a line contains an error message."""
-        error_indicators = [
-            'error:', 'Error:', 'ERROR:',
-            'failed:', 'Failed:', 'FAILED:',
-            'exception:', 'Exception:', 'EXCEPTION:',
-            'traceback:', 'Traceback:',
-            'syntax error', 'type error',
-            'command not found',
-            'permission denied',
-            'npm ERR!',
-            'FAIL:'
-        ]
-        
         line_lower = line.lower()
-        return any(indicator.lower() in line_lower for indicator in error_indicators)
-    
-    def _extract_tool_usage(self, line: str) -> Optional[Dict[str, Any]]:
-        """Extract tool usage information from a line."""
-        # Common tool patterns
-        tool_patterns = [
-            (r'running.*?`([^`]+)`', 'shell_command'),
-            (r'executing.*?`([^`]+)`', 'shell_command'),
-            (r'editing.*?file.*?`([^`]+)`', 'file_edit'),
-            (r'creating.*?file.*?`([^`]+)`', 'file_create'),
-            (r'reading.*?file.*?`([^`]+)`', 'file_read'),
-            (r'git\s+([a-zA-Z]+)', 'git_command'),
-            (r'npm\s+([a-zA-Z]+)', 'npm_command'),
-            (r'python\s+([^\s]+)', 'python_script'),
-            (r'node\s+([^\s]+)', 'node_script'),
-        ]
-        
-        for pattern, tool_type in tool_patterns:
-            match = re.search(pattern, line, re.IGNORECASE)
-            if match:
-                return {
-                    'type': tool_type,
-                    'command': match.group(1),
-                    'full_line': line,
-                    'timestamp': datetime.now().isoformat()
-                }
-        
-        return None
+        return any(indicator in line_lower for indicator in _ERROR_INDICATORS)
     
     def _looks_like_user_prompt(self, line: str) -> bool:
         """Simple heuristic to identify user prompts."""
@@ -175,26 +186,12 @@ class ConversationAnalyzer:
             return False
         
         # Skip lines that start with common system prefixes
-        system_prefixes = [
-            '>', '$ ', '+ ', '- ', '* ',
-            'INFO:', 'DEBUG:', 'WARN:', 'ERROR:',
-            'npm ', 'git ', 'python ', 'node ',
-            'Running', 'Executing', 'Creating', 'Editing'
-        ]
-        
-        for prefix in system_prefixes:
-            if line.startswith(prefix):
-                return False
+        if line.startswith(_SYSTEM_PREFIXES):
+            return False
         
         # If it contains question words or request patterns, likely a prompt
-        prompt_indicators = [
-            'can you', 'please', 'how do', 'what is', 'why does',
-            'help me', 'i need', 'could you', 'would you',
-            'create', 'make', 'build', 'implement', 'fix', 'debug'
-        ]
-        
         line_lower = line.lower()
-        return any(indicator in line_lower for indicator in prompt_indicators)
+        return any(indicator in line_lower for indicator in _PROMPT_INDICATORS)
     
     def analyze_command_patterns(self, session_data: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze patterns in command usage."""
@@ -219,17 +216,16 @@ class ConversationAnalyzer:
         
         # Analyze error contexts (what commands preceded errors)
         error_messages = session_data.get('error_messages', [])
-        if error_messages and slash_commands:
-            # Simple approach: last command before each error
-            for i, error in enumerate(error_messages):
-                if slash_commands:
-                    # Find the most recent command before this error
-                    recent_command = slash_commands[-1] if slash_commands else None
-                    if recent_command:
-                        patterns['error_contexts'].append({
-                            'error': error[:100],  # Truncate long errors
-                            'preceding_command': recent_command
-                        })
+        # Simple approach: the last command of the session precedes every error
+        recent_command = slash_commands[-1] if slash_commands else None
+        if error_messages and recent_command:
+            patterns['error_contexts'] = [
+                {
+                    'error': error[:100],  # Truncate long errors
+                    'preceding_command': recent_command
+                }
+                for error in error_messages
+            ]
         
         # Categorize prompts
         user_prompts = session_data.get('user_prompts', [])
@@ -240,34 +236,15 @@ class ConversationAnalyzer:
     
     def _categorize_prompts(self, prompts: List[str]) -> Dict[str, int]:
         """Categorize user prompts by intent."""
-        categories = {
-            'code_creation': 0,
-            'debugging': 0,
-            'refactoring': 0,
-            'testing': 0,
-            'documentation': 0,
-            'explanation': 0,
-            'configuration': 0,
-            'other': 0
-        }
+        categories = {category: 0 for category, _ in _PROMPT_CATEGORIES}
+        categories['other'] = 0
         
         for prompt in prompts:
             prompt_lower = prompt.lower()
-            
-            if any(word in prompt_lower for word in ['create', 'make', 'build', 'implement', 'write', 'add']):
-                categories['code_creation'] += 1
-            elif any(word in prompt_lower for word in ['debug', 'fix', 'error', 'bug', 'issue', 'problem']):
-                categories['debugging'] += 1
-            elif any(word in prompt_lower for word in ['refactor', 'improve', 'optimize', 'clean', 'restructure']):
-                categories['refactoring'] += 1
-            elif any(word in prompt_lower for word in ['test', 'spec', 'unit', 'integration', 'e2e']):
-                categories['testing'] += 1
-            elif any(word in prompt_lower for word in ['document', 'comment', 'readme', 'docs', 'explain']):
-                categories['documentation'] += 1
-            elif any(word in prompt_lower for word in ['what', 'why', 'how', 'explain', 'understand']):
-                categories['explanation'] += 1
-            elif any(word in prompt_lower for word in ['config', 'setup', 'install', 'configure', 'setting']):
-                categories['configuration'] += 1
+            for category, words in _PROMPT_CATEGORIES:
+                if any(word in prompt_lower for word in words):
+                    categories[category] += 1
+                    break
             else:
                 categories['other'] += 1
         
@@ -275,17 +252,17 @@ class ConversationAnalyzer:
     
     def update_conversation_patterns(self, session_data: Dict[str, Any]):
         """Update stored patterns with new conversation data."""
+        now = datetime.now().isoformat()
         try:
             # Load existing patterns
             if self.patterns_file.exists():
-                with open(self.patterns_file, 'r') as f:
-                    patterns = json.load(f)
+                patterns = _loads(self.patterns_file.read_bytes())
             else:
                 patterns = {
                     'commands': {},
                     'errors': {},
                     'conversations': {},
-                    'last_updated': datetime.now().isoformat()
+                    'last_updated': now
                 }
             
             # Analyze new patterns
@@ -296,27 +273,31 @@ class ConversationAnalyzer:
                 patterns['conversations'] = {}
             
             # Update command usage
-            for cmd, count in new_patterns.get('most_used_slash_commands', {}).items():
-                if cmd not in patterns['commands']:
-                    patterns['commands'][cmd] = 0
-                patterns['commands'][cmd] += count
+            commands = Counter(patterns.get('commands', {}))
+            commands.update(new_patterns.get('most_used_slash_commands', {}))
+            patterns['commands'] = commands
             
             # Update conversation-specific patterns
             patterns['conversations'].update({
                 'last_session_patterns': new_patterns,
-                'last_analysis': datetime.now().isoformat(),
+                'last_analysis': now,
                 'total_sessions_analyzed': patterns['conversations'].get('total_sessions_analyzed', 0) + 1
             })
             
-            patterns['last_updated'] = datetime.now().isoformat()
+            patterns['last_updated'] = now
             
             # Save updated patterns
-            with open(self.patterns_file, 'w') as f:
-                json.dump(patterns, f, indent=2)
+            self._write_patterns(patterns)
                 
         except (json.JSONDecodeError, OSError) as e:
             print(f"Error updating conversation patterns: {e}", file=sys.stderr)
     
+    def _write_patterns(self, patterns: Dict[str, Any]):
+        """Atomically replace patterns.json, as ContextAnalyzer._write_patterns does."""
+        tmp_file = self.storage_dir / f'patterns.json.tmp.{os.getpid()}'
+        tmp_file.write_bytes(_dumps(patterns, indent=True))
+        os.replace(tmp_file, self.patterns_file)
+    
     def analyze_session(self, log_content: str) -> Dict[str, Any]:
         """Main method to analyze a session log."""
         session_data = self.parse_session_log(log_content)
@@ -5,199 +5,23 @@ Generates custom slash commands based on learned usage patterns.
 """
 
 import json
+import logging
 import os
 import sys
-from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping, NamedTuple, Optional, Tuple
 
-class CommandBuilder:
-    def __init__(self, project_root: str):
-        self.project_root = Path(project_root)
-        self.rulecrafter_dir = self.project_root / '.claude' / 'rulecrafter'
-        self.storage_dir = self.rulecrafter_dir / 'storage'
-        self.patterns_file = self.storage_dir / 'patterns.json'
-        self.commands_dir = self.project_root / '.claude' / 'commands' / 'auto-generated'
-        
-        # Ensure commands directory exists
-        self.commands_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Command generation thresholds
-        self.usage_threshold = 10  # Generate command after 10+ similar usages
-        self.confidence_threshold = 0.7
-    
-    def load_patterns(self) -> Dict[str, Any]:
-        """Load patterns from storage."""
-        if not self.patterns_file.exists():
-            return {}
-        
-        try:
-            with open(self.patterns_file, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, OSError):
-            return {}
-    
-    def analyze_command_opportunities(self, patterns: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Analyze patterns to identify opportunities for new commands."""
-        opportunities = []
-        
-        # Analyze conversation patterns for repeated requests
-        conversations = patterns.get('conversations', {})
-        if conversations:
-            opportunities.extend(self._analyze_conversation_patterns(conversations))
-        
-        # Analyze tool usage patterns
-        file_types = patterns.get('file_types', {})
-        if file_types:
-            opportunities.extend(self._analyze_file_type_patterns(file_types))
-        
-        # Analyze error patterns for debugging commands
-        errors = patterns.get('errors', {})
-        if errors:
-            opportunities.extend(self._analyze_error_patterns(errors))
-        
-        # Analyze git patterns for workflow commands
-        git_patterns = patterns.get('git_patterns', {})
-        files_changed = patterns.get('files_changed', {})
-        if files_changed:
-            opportunities.extend(self._analyze_git_patterns(files_changed))
-        
-        return opportunities
-    
-    def _analyze_conversation_patterns(self, conversations: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Analyze conversation patterns for command opportunities."""
-        opportunities = []
-        
-        last_session = conversations.get('last_session_patterns', {})
-        prompt_categories = last_session.get('prompt_categories', {})
-        
-        # Testing patterns
-        if prompt_categories.get('testing', 0) >= 5:
-            opportunities.append({
-                'command_name': 'smart_test',
-                'description': 'Run tests with coverage and update snapshots automatically',
-                'category': 'testing',
-                'template': self._create_test_command_template(),
-                'confidence': min(0.9, prompt_categories['testing'] / 10.0),
-                'evidence': {'testing_prompts': prompt_categories['testing']}
-            })
-        
-        # Debugging patterns
-        if prompt_categories.get('debugging', 0) >= 5:
-            opportunities.append({
-                'command_name': 'debug_helper',
-                'description': 'Systematic debugging workflow with logging and error analysis',
-                'category': 'debugging',
-                'template': self._create_debug_command_template(),
-                'confidence': min(0.9, prompt_categories['debugging'] / 10.0),
-                'evidence': {'debugging_prompts': prompt_categories['debugging']}
-            })
-        
-        # Refactoring patterns
-        if prompt_categories.get('refactoring', 0) >= 3:
-            opportunities.append({
-                'command_name': 'safe_refactor',
-                'description': 'Refactor code with tests and safety checks',
-                'category': 'refactoring',
-                'template': self._create_refactor_command_template(),
-                'confidence': min(0.8, prompt_categories['refactoring'] / 5.0),
-                'evidence': {'refactoring_prompts': prompt_categories['refactoring']}
-            })
-        
-        return opportunities
-    
-    def _analyze_file_type_patterns(self, file_types: Dict[str, int]) -> List[Dict[str, Any]]:
-        """Analyze file type patterns for technology-specific commands."""
-        opportunities = []
-        total_changes = sum(file_types.values())
-        
-        if total_changes < 5:
-            return opportunities
-        
-        # TypeScript/JavaScript patterns
-        js_ts_files = (file_types.get('.ts', 0) + file_types.get('.tsx', 0) + 
-                      file_types.get('.js', 0) + file_types.get('.jsx', 0))
-        
-        if js_ts_files / total_changes > 0.6:
-            opportunities.append({
-                'command_name': 'ts_check',
-                'description': 'Run TypeScript type checking and fix common issues',
-                'category': 'typescript',
-                'template': self._create_typescript_command_template(),
-                'confidence': 0.8,
-                'evidence': {'js_ts_ratio': js_ts_files / total_changes}
-            })
-        
-        # Python patterns
-        py_files = file_types.get('.py', 0)
-        if py_files / total_changes > 0.6:
-            opportunities.append({
-                'command_name': 'py_lint',
-                'description': 'Run Python linting, formatting, and type checking',
-                'category': 'python',
-                'template': self._create_python_command_template(),
-                'confidence': 0.8,
-                'evidence': {'python_ratio': py_files / total_changes}
-            })
-        
-        return opportunities
-    
-    def _analyze_error_patterns(self, errors: Dict[str, int]) -> List[Dict[str, Any]]:
-        """Analyze error patterns for debugging commands."""
-        opportunities = []
-        
-        # Count TypeScript errors
-        ts_errors = sum(count for error_key, count in errors.items() 
-                       if 'typescript_error' in error_key)
-        
-        if ts_errors >= 5:
-            opportunities.append({
-                'command_name': 'fix_ts_errors',
-                'description': 'Analyze and fix common TypeScript errors',
-                'category': 'debugging',
-                'template': self._create_ts_fix_command_template(),
-                'confidence': min(0.9, ts_errors / 10.0),
-                'evidence': {'typescript_errors': ts_errors}
-            })
-        
-        # Count npm/dependency errors
-        npm_errors = sum(count for error_key, count in errors.items() 
-                        if 'npm_error' in error_key or 'module_not_found' in error_key)
-        
-        if npm_errors >= 3:
-            opportunities.append({
-                'command_name': 'fix_deps',
-                'description': 'Fix dependency and module resolution issues',
-                'category': 'debugging',
-                'template': self._create_deps_fix_command_template(),
-                'confidence': min(0.8, npm_errors / 5.0),
-                'evidence': {'dependency_errors': npm_errors}
-            })
-        
-        return opportunities
-    
-    def _analyze_git_patterns(self, files_changed: Dict[str, int]) -> List[Dict[str, Any]]:
-        """Analyze git patterns for workflow commands."""
-        opportunities = []
-        
-        # If many files are frequently changed, suggest a commit helper
-        frequently_changed = [f for f, count in files_changed.items() if count >= 5]
-        
-        if len(frequently_changed) >= 3:
-            opportunities.append({
-                'command_name': 'smart_commit',
-                'description': 'Analyze changes and generate meaningful commit messages',
-                'category': 'git',
-                'template': self._create_commit_command_template(),
-                'confidence': 0.7,
-                'evidence': {'frequently_changed_files': len(frequently_changed)}
-            })
-        
-        return opportunities
-    
-    def _create_test_command_template(self) -> str:
-        """Create a template for smart test command."""
-        return """## smart_test
+log = logging.getLogger(__name__)
+
+# _jsonio.py lives one directory up, beside analyzers/ and generators/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _jsonio import loads as _loads, dumps as _dumps
+
+# Command file bodies, keyed by command name
+_TEMPLATES = {
+    # Smart test command
+    'smart_test': """## smart_test
 Run comprehensive test suite with coverage and automatic snapshot updates.
 
 **Usage:** `/smart_test [pattern]`
@@ -229,11 +53,10 @@ npm run test:coverage
 ```
 
 *Auto-generated by RuleCrafter based on testing patterns*
-"""
-    
-    def _create_debug_command_template(self) -> str:
-        """Create a template for debug helper command."""
-        return """## debug_helper
+""",
+
+    # Debug helper command
+    'debug_helper': """## debug_helper
 Systematic debugging workflow with logging and error analysis.
 
 **Usage:** `/debug_helper [error_type]`
@@ -276,11 +99,10 @@ fi
 ```
 
 *Auto-generated by RuleCrafter based on debugging patterns*
-"""
-    
-    def _create_refactor_command_template(self) -> str:
-        """Create a template for safe refactor command."""
-        return """## safe_refactor
+""",
+
+    # Safe refactor command
+    'safe_refactor': """## safe_refactor
 Refactor code with tests and safety checks.
 
 **Usage:** `/safe_refactor <file_or_directory>`
@@ -323,11 +145,10 @@ echo "💡 To restore backup if needed: git stash pop"
 ```
 
 *Auto-generated by RuleCrafter based on refactoring patterns*
-"""
-    
-    def _create_typescript_command_template(self) -> str:
-        """Create a template for TypeScript checking command."""
-        return """## ts_check
+""",
+
+    # TypeScript checking command
+    'ts_check': """## ts_check
 Run TypeScript type checking and fix common issues.
 
 **Usage:** `/ts_check [--fix]`
@@ -362,11 +183,10 @@ echo "✅ TypeScript check complete"
 ```
 
 *Auto-generated by RuleCrafter based on TypeScript usage patterns*
-"""
-    
-    def _create_python_command_template(self) -> str:
-        """Create a template for Python linting command."""
-        return """## py_lint
+""",
+
+    # Python linting command
+    'py_lint': """## py_lint
 Run Python linting, formatting, and type checking.
 
 **Usage:** `/py_lint [--fix]`
@@ -409,11 +229,10 @@ echo "✅ Python check complete"
 ```
 
 *Auto-generated by RuleCrafter based on Python usage patterns*
-"""
-    
-    def _create_ts_fix_command_template(self) -> str:
-        """Create a template for TypeScript error fixing command."""
-        return """## fix_ts_errors
+""",
+
+    # TypeScript error fixing command
+    'fix_ts_errors': """## fix_ts_errors
 Analyze and fix common TypeScript errors.
 
 **Usage:** `/fix_ts_errors`
@@ -449,11 +268,10 @@ echo "$TSC_OUTPUT" | grep "TS2304" > /dev/null && echo "🎯 TS2304 found: Add m
 ```
 
 *Auto-generated by RuleCrafter based on TypeScript error patterns*
-"""
-    
-    def _create_deps_fix_command_template(self) -> str:
-        """Create a template for dependency fixing command."""
-        return """## fix_deps
+""",
+
+    # Dependency fixing command
+    'fix_deps': """## fix_deps
 Fix dependency and module resolution issues.
 
 **Usage:** `/fix_deps`
@@ -491,11 +309,10 @@ echo "   • TypeScript paths are configured correctly"
 ```
 
 *Auto-generated by RuleCrafter based on dependency error patterns*
-"""
-    
-    def _create_commit_command_template(self) -> str:
-        """Create a template for smart commit command."""
-        return """## smart_commit
+""",
+
+    # Smart commit command
+    'smart_commit': """## smart_commit
 Analyze changes and generate meaningful commit messages.
 
 **Usage:** `/smart_commit [type]`
@@ -548,37 +365,274 @@ echo "Example: $COMMIT_TYPE: add user authentication feature"
 ```
 
 *Auto-generated by RuleCrafter based on git usage patterns*
+""",
+}
+
+# UTF-8 encodings of the templates above, computed once at import
+_TEMPLATE_BYTES = {name: template.encode('utf-8') for name, template in _TEMPLATES.items()}
+
+# Metadata header prepended to every generated command file
+_HEADER_TEMPLATE = """---
+# Auto-generated by RuleCrafter
+# Generated: {timestamp}
+# Category: {category}
+# Confidence: {confidence:.2f}
+# Evidence: {evidence}
+---
+
 """
+
+# Extensions counted as TypeScript/JavaScript changes
+_JS_TS_EXTENSIONS = frozenset(('.ts', '.tsx', '.js', '.jsx'))
+
+# Commands suggested by repeated prompt categories:
+# (category, min prompts, max confidence, confidence divisor, prompts that reach
+#  max confidence, command, description); confidence is count / divisor
+_PROMPT_COMMANDS = (
+    ('testing', 5, 0.9, 10.0, 9, 'smart_test',
+     'Run tests with coverage and update snapshots automatically'),
+    ('debugging', 5, 0.9, 10.0, 9, 'debug_helper',
+     'Systematic debugging workflow with logging and error analysis'),
+    ('refactoring', 3, 0.8, 5.0, 4, 'safe_refactor',
+     'Refactor code with tests and safety checks'),
+)
+
+class Opportunity(NamedTuple):
+    """A command worth generating, with the evidence behind it."""
+    command_name: str
+    description: str
+    category: str
+    confidence: float
+    evidence: Dict[str, Any]
+
+class _PatternInputs(NamedTuple):
+    """The parts of patterns.json that the command analyzers read."""
+    prompt_categories: Mapping[str, int]
+    file_types: Mapping[str, int]
+    errors: Mapping[str, int]
+    files_changed: Mapping[str, int]
+
+# Shared read-only default for missing sections, so lookups allocate nothing
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+
+def _extract(patterns: Dict[str, Any]) -> _PatternInputs:
+    """Resolve the nested lookups the analyzers need, once per analysis."""
+    last_session = patterns.get('conversations', _EMPTY).get('last_session_patterns', _EMPTY)
+    return _PatternInputs(
+        prompt_categories=last_session.get('prompt_categories', _EMPTY),
+        file_types=patterns.get('file_types', _EMPTY),
+        errors=patterns.get('errors', _EMPTY),
+        files_changed=patterns.get('files_changed', _EMPTY)
+    )
+
+class CommandBuilder:
+    # Parsed patterns shared by builders in this process, keyed by file path and
+    # validated against the file's (mtime, size) so a rewrite is always picked up
+    _patterns_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+    
+    def __init__(self, project_root: str):
+        # Plain string paths; nothing here needs Path methods
+        self.project_root = os.fspath(project_root)
+        self.rulecrafter_dir = os.path.join(self.project_root, '.claude', 'rulecrafter')
+        self.storage_dir = os.path.join(self.rulecrafter_dir, 'storage')
+        self.patterns_file = os.path.join(self.storage_dir, 'patterns.json')
+        self.commands_dir = os.path.join(self.project_root, '.claude', 'commands', 'auto-generated')
+        
+        # Commands directory is created on the first write, not up front
+        self._commands_dir_ready = False
+        
+        # Command generation thresholds
+        self.usage_threshold = 10  # Generate command after 10+ similar usages
+        self.confidence_threshold = 0.7
     
-    def create_command_file(self, opportunity: Dict[str, Any]) -> bool:
-        """Create a command file from an opportunity."""
+    def load_patterns(self) -> Dict[str, Any]:
+        """Load patterns from storage, reusing the last parse if the file is unchanged."""
         try:
-            command_name = opportunity['command_name']
-            template = opportunity['template']
+            st = os.stat(self.patterns_file)
+        except OSError:
+            return {}
+        
+        version = (st.st_mtime_ns, st.st_size)
+        cached = self._patterns_cache.get(self.patterns_file)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        try:
+            with open(self.patterns_file, 'rb') as f:
+                patterns = _loads(f.read())
+        except (json.JSONDecodeError, OSError):
+            return {}
+        
+        self._patterns_cache[self.patterns_file] = (version, patterns)
+        return patterns
+    
+    def analyze_command_opportunities(self, patterns: Dict[str, Any]) -> List[Opportunity]:
+        """Analyze patterns to identify opportunities for new commands."""
+        opportunities = []
+        inputs = _extract(patterns)
+        
+        # Analyze conversation patterns for repeated requests
+        if inputs.prompt_categories:
+            opportunities.extend(self._analyze_conversation_patterns(inputs.prompt_categories))
+        
+        # Analyze tool usage patterns
+        if inputs.file_types:
+            opportunities.extend(self._analyze_file_type_patterns(inputs.file_types))
+        
+        # Analyze error patterns for debugging commands
+        if inputs.errors:
+            opportunities.extend(self._analyze_error_patterns(inputs.errors))
+        
+        # Analyze git patterns for workflow commands
+        if inputs.files_changed:
+            opportunities.extend(self._analyze_git_patterns(inputs.files_changed))
+        
+        return opportunities
+    
+    def _analyze_conversation_patterns(self, prompt_categories: Dict[str, int]) -> List[Opportunity]:
+        """Analyze conversation patterns for command opportunities."""
+        opportunities = []
+        
+        for (category, min_prompts, max_confidence, confidence_divisor, max_prompts,
+             command_name, description) in _PROMPT_COMMANDS:
+            count = prompt_categories.get(category, 0)
+            if count >= min_prompts:
+                opportunities.append(Opportunity(
+                    command_name=command_name,
+                    description=description,
+                    category=category,
+                    confidence=max_confidence if count >= max_prompts else count / confidence_divisor,
+                    evidence={f'{category}_prompts': count}
+                ))
+        
+        return opportunities
+    
+    def _analyze_file_type_patterns(self, file_types: Dict[str, int]) -> List[Opportunity]:
+        """Analyze file type patterns for technology-specific commands."""
+        opportunities = []
+        
+        # Tally total, TypeScript/JavaScript and Python changes in one pass
+        total_changes = js_ts_files = py_files = 0
+        for ext, count in file_types.items():
+            total_changes += count
+            if ext in _JS_TS_EXTENSIONS:
+                js_ts_files += count
+            elif ext == '.py':
+                py_files += count
+        
+        if total_changes < 5:
+            return opportunities
+        
+        # TypeScript/JavaScript patterns
+        if js_ts_files / total_changes > 0.6:
+            opportunities.append(Opportunity(
+                command_name='ts_check',
+                description='Run TypeScript type checking and fix common issues',
+                category='typescript',
+                confidence=0.8,
+                evidence={'js_ts_ratio': js_ts_files / total_changes}
+            ))
+        
+        # Python patterns
+        if py_files / total_changes > 0.6:
+            opportunities.append(Opportunity(
+                command_name='py_lint',
+                description='Run Python linting, formatting, and type checking',
+                category='python',
+                confidence=0.8,
+                evidence={'python_ratio': py_files / total_changes}
+            ))
+        
+        return opportunities
+    
+    def _analyze_error_patterns(self, errors: Dict[str, int]) -> List[Opportunity]:
+        """Analyze error patterns for debugging commands."""
+        opportunities = []
+        
+        # Count TypeScript and npm/dependency errors in one pass
+        ts_errors = npm_errors = 0
+        for error_key, count in errors.items():
+            if 'typescript_error' in error_key:
+                ts_errors += count
+            if 'npm_error' in error_key or 'module_not_found' in error_key:
+                npm_errors += count
+        
+        if ts_errors >= 5:
+            opportunities.append(Opportunity(
+                command_name='fix_ts_errors',
+                description='Analyze and fix common TypeScript errors',
+                category='debugging',
+                confidence=0.9 if ts_errors >= 9 else ts_errors / 10.0,
+                evidence={'typescript_errors': ts_errors}
+            ))
+        
+        if npm_errors >= 3:
+            opportunities.append(Opportunity(
+                command_name='fix_deps',
+                description='Fix dependency and module resolution issues',
+                category='debugging',
+                confidence=0.8 if npm_errors >= 4 else npm_errors / 5.0,
+                evidence={'dependency_errors': npm_errors}
+            ))
+        
+        return opportunities
+    
+    def _analyze_git_patterns(self, files_changed: Dict[str, int]) -> List[Opportunity]:
+        """Analyze git patterns for workflow commands."""
+        opportunities = []
+        
+        # Fewer tracked files than needed can never qualify; skip the scan
+        if len(files_changed) < 3:
+            return opportunities
+        
+        # If many files are frequently changed, suggest a commit helper
+        frequently_changed = sum(1 for count in files_changed.values() if count >= 5)
+        
+        if frequently_changed >= 3:
+            opportunities.append(Opportunity(
+                command_name='smart_commit',
+                description='Analyze changes and generate meaningful commit messages',
+                category='git',
+                confidence=0.7,
+                evidence={'frequently_changed_files': frequently_changed}
+            ))
+        
+        return opportunities
+    
+    def create_command_file(self, opportunity: Opportunity, timestamp: Optional[str] = None) -> bool:
+        """Create a command file from an opportunity, stamped with timestamp (default: now)."""
+        try:
+            command_name = opportunity.command_name
             
-            command_file = self.commands_dir / f"{command_name}.md"
+            command_file = os.path.join(self.commands_dir, f"{command_name}.md")
+            
+            # Ensure commands directory exists, checking only on the first write
+            if not self._commands_dir_ready:
+                os.makedirs(self.commands_dir, exist_ok=True)
+                self._commands_dir_ready = True
             
             # Add metadata header
-            header = f"""---
-# Auto-generated by RuleCrafter
-# Generated: {datetime.now().isoformat()}
-# Category: {opportunity.get('category', 'general')}
-# Confidence: {opportunity.get('confidence', 0):.2f}
-# Evidence: {opportunity.get('evidence', {})}
----
-
-"""
+            header = _HEADER_TEMPLATE.format_map({
+                'timestamp': timestamp or datetime.now().isoformat(),
+                'category': opportunity.category,
+                'confidence': opportunity.confidence,
+                'evidence': opportunity.evidence
+            })
             
-            with open(command_file, 'w') as f:
-                f.write(header + template)
+            # Write to a temp file and swap it into place, so Claude Code never
+            # loads a half-written command
+            tmp_file = f"{command_file}.tmp.{os.getpid()}"
+            with open(tmp_file, 'wb') as f:
+                f.write(b''.join((header.encode('utf-8'), _TEMPLATE_BYTES[command_name])))
+            os.replace(tmp_file, command_file)
             
             return True
             
         except OSError as e:
-            print(f"Error creating command file: {e}", file=sys.stderr)
+            log.error("Error creating command file: %s", e)
             return False
     
-    def generate_commands(self) -> List[Dict[str, Any]]:
+    def generate_commands(self) -> List[Opportunity]:
         """Generate commands based on current patterns."""
         patterns = self.load_patterns()
         if not patterns:
@@ -589,7 +643,7 @@ echo "Example: $COMMIT_TYPE: add user authentication feature"
         # Filter by confidence threshold
         high_confidence_opportunities = [
             opp for opp in opportunities 
-            if opp.get('confidence', 0) >= self.confidence_threshold
+            if opp.confidence >= self.confidence_threshold
         ]
         
         return high_confidence_opportunities
@@ -598,18 +652,20 @@ echo "Example: $COMMIT_TYPE: add user authentication feature"
         """Generate and deploy new commands."""
         opportunities = self.generate_commands()
         
+        # One timestamp for the whole batch of files and the result
+        timestamp = datetime.now().isoformat()
+        
         created_commands = []
         failed_commands = []
         
         for opportunity in opportunities:
-            command_name = opportunity['command_name']
+            command_name = opportunity.command_name
             
             # Check if command already exists
-            command_file = self.commands_dir / f"{command_name}.md"
-            if command_file.exists():
+            if os.path.exists(os.path.join(self.commands_dir, f"{command_name}.md")):
                 continue  # Skip existing commands
             
-            if self.create_command_file(opportunity):
+            if self.create_command_file(opportunity, timestamp):
                 created_commands.append(command_name)
             else:
                 failed_commands.append(command_name)
@@ -618,7 +674,7 @@ echo "Example: $COMMIT_TYPE: add user authentication feature"
             'created_commands': created_commands,
             'failed_commands': failed_commands,
             'total_opportunities': len(opportunities),
-            'timestamp': datetime.now().isoformat()
+            'timestamp': timestamp
         }
 
 def main():
@@ -629,10 +685,12 @@ def main():
     
     project_root = sys.argv[1]
     
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(message)s')
+    
     builder = CommandBuilder(project_root)
     result = builder.build_and_deploy_commands()
     
-    print(json.dumps(result, indent=2))
+    print(_dumps(result, indent=True).decode('utf-8'))
 
 if __name__ == "__main__":
     main()
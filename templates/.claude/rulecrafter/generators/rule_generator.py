@@ -4,109 +4,212 @@ Rule Generator for RuleCrafter
 Generates and updates rules in CLAUDE.md based on learned patterns.
 """
 
+import atexit
 import json
 import os
 import sys
 import re
+import time
+import weakref
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping, Optional, Tuple
+
+# _jsonio.py lives one directory up, beside analyzers/ and generators/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _jsonio import loads as _loads, dumps as _dumps
+
+# Read-only stand-in for a rule without evidence
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+
+# TypeScript diagnostic codes such as TS2322
+_TS_CODE_RE = re.compile(r'TS\d+')
+
+# Per error type, the pattern that pulls a specific code out of the message
+_CODE_EXTRACTORS = {
+    'typescript_error': _TS_CODE_RE,
+}
+
+# Rule text per error type, keyed by extracted code or 'default'
+_RULE_TEMPLATES = {
+    'typescript_error': {
+        'TS2322': "- Always provide explicit type annotations when TypeScript cannot infer types correctly.",
+        'TS2345': "- Ensure function arguments match the expected parameter types exactly.",
+        'TS2339': "- Verify property names and consider using optional chaining (?.) for potentially undefined objects.",
+        'TS2304': "- Import all required types and modules before using them.",
+        'TS2571': "- Use type assertions (as Type) only when you're certain about the type.",
+    },
+    'syntax_error': {
+        'default': "- Review syntax carefully and use proper linting tools to catch errors early."
+    },
+    'type_error': {
+        'default': "- Add type checking and validation for function parameters and return values."
+    },
+    'eslint_error': {
+        'default': "- Follow ESLint rules consistently and configure auto-fix for common issues."
+    },
+    'npm_error': {
+        'default': "- Clear npm cache and node_modules when encountering persistent package issues."
+    },
+    'test_failure': {
+        'default': "- Review test assertions and ensure test data matches expected formats."
+    },
+    'module_not_found': {
+        'default': "- Verify import paths are correct and all dependencies are installed."
+    },
+    'permission_error': {
+        'default': "- Check file permissions and ensure the user has appropriate access rights."
+    }
+}
+
+# Rule text per frequently used slash command
+_WORKFLOW_TEMPLATES = {
+    '/test': "- Run tests frequently during development to catch issues early.",
+    '/review': "- Use code review commands to maintain quality standards.",
+    '/build': "- Build the project after significant changes to verify compilation.",
+    '/lint': "- Run linting before committing code to maintain consistency.",
+    '/format': "- Apply consistent formatting across the codebase.",
+    '/docs': "- Keep documentation updated alongside code changes.",
+    '/deploy': "- Follow deployment procedures and verify in staging first.",
+    '/debug': "- Use systematic debugging approaches to isolate issues.",
+    '/optimize': "- Profile before optimizing to identify actual bottlenecks.",
+    '/refactor': "- Refactor in small, testable increments.",
+}
+
+# Technology rules by dominant file extension, in priority order
+_FILE_EXT_RULES = (
+    (('.ts', '.tsx'), 'TypeScript', "- Use strict TypeScript configuration and enable all recommended compiler options."),
+    (('.py',), 'Python', "- Follow PEP 8 style guidelines and use type hints for better code clarity."),
+    (('.js', '.jsx'), 'JavaScript', "- Use ESLint and Prettier for consistent code formatting and quality."),
+)
+
+# The RuleCrafter section of CLAUDE.md: its heading up to the next end marker
+_SECTION_START = "## RuleCrafter Adaptive Rules"
+_SECTION_END = "---"
+_SECTION_RE = re.compile(re.escape(_SECTION_START) + r'.*?(?=' + re.escape(_SECTION_END) + r'|\Z)', re.DOTALL)
+
+# Generators flushed at exit. Only weak references are held, so registering
+# does not keep an instance alive; one collected earlier flushes in __del__.
+_live_generators = weakref.WeakSet()
+
+@atexit.register
+def _flush_at_exit():
+    """Write whatever every live generator still has deferred."""
+    for generator in list(_live_generators):
+        generator.flush(force=True)
 
 class RuleGenerator:
+    # Per-process parse cache, as in CommandBuilder; an entry is reused only
+    # while patterns.json keeps the same (mtime, size)
+    _patterns_cache: Dict[Path, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+    
     def __init__(self, project_root: str):
         self.project_root = Path(project_root)
         self.rulecrafter_dir = self.project_root / '.claude' / 'rulecrafter'
         self.storage_dir = self.rulecrafter_dir / 'storage'
         self.patterns_file = self.storage_dir / 'patterns.json'
         self.claude_md = self.project_root / 'CLAUDE.md'
+        self.pending_file = self.storage_dir / 'pending_rules.json'
         
         # Rule generation thresholds
         self.error_threshold = 3  # Generate rule after 3+ occurrences
         self.command_threshold = 5  # Generate rule after 5+ usages
         self.confidence_threshold = 0.7  # Minimum confidence for auto-generation
+        
+        # Timestamp shared by every rule in a batch; refreshed by generate_rules
+        self._now_iso = datetime.now().isoformat()
+        
+        # Writes to CLAUDE.md and pending_rules.json are buffered and flushed at
+        # most once per flush_interval seconds, plus once more at exit
+        self.flush_interval = 5.0
+        self._claude_md_section = None
+        self._dirty = False
+        self._last_flush = 0.0
+        
+        # Rules staged since the last flush; flush() appends them to pending_rules.json
+        self._pending_rules = []
+        _live_generators.add(self)
+    
+    def __del__(self):
+        # A generator dropped before exit still writes what it deferred
+        if getattr(self, '_dirty', False):
+            self.flush(force=True)
     
     def load_patterns(self) -> Dict[str, Any]:
-        """Load patterns from storage."""
-        if not self.patterns_file.exists():
+        """Load patterns from storage, reusing the last parse if the file is unchanged."""
+        try:
+            st = self.patterns_file.stat()
+        except OSError:
             return {}
         
+        version = (st.st_mtime_ns, st.st_size)
+        cached = self._patterns_cache.get(self.patterns_file)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
         try:
-            with open(self.patterns_file, 'r') as f:
-                return json.load(f)
+            patterns = _loads(self.patterns_file.read_bytes())
         except (json.JSONDecodeError, OSError):
             return {}
+        
+        self._patterns_cache[self.patterns_file] = (version, patterns)
+        return patterns
+    
+    def _make_rule(self, rule_type: str, category: str, rule_text: str,
+                   evidence: Dict[str, Any], confidence: float) -> Dict[str, Any]:
+        """Build a rule dict stamped with the current batch timestamp."""
+        return {
+            'type': rule_type,
+            'category': category,
+            'rule': rule_text,
+            'evidence': evidence,
+            'confidence': confidence,
+            'timestamp': self._now_iso
+        }
     
     def analyze_error_patterns(self, patterns: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Analyze error patterns and generate rule suggestions."""
         rules = []
         errors = patterns.get('errors', {})
         
-        for error_key, count in errors.items():
-            if count >= self.error_threshold:
-                error_type, message = error_key.split(':', 1)
-                rule = self._generate_error_rule(error_type, message, count)
-                if rule:
-                    rules.append(rule)
+        # Most errors stay under the threshold, so drop them before any string work
+        candidates = [(key, count) for key, count in errors.items() if count >= self.error_threshold]
+        for error_key, count in candidates:
+            error_type, sep, message = error_key.partition(':')
+            if not sep:
+                continue  # Not a "type:message" key
+            rule = self._generate_error_rule(error_type, message, count)
+            if rule:
+                rules.append(rule)
         
         return rules
     
     def _generate_error_rule(self, error_type: str, message: str, count: int) -> Optional[Dict[str, Any]]:
         """Generate a specific rule based on error pattern."""
-        rule_templates = {
-            'typescript_error': {
-                'TS2322': "- Always provide explicit type annotations when TypeScript cannot infer types correctly.",
-                'TS2345': "- Ensure function arguments match the expected parameter types exactly.",
-                'TS2339': "- Verify property names and consider using optional chaining (?.) for potentially undefined objects.",
-                'TS2304': "- Import all required types and modules before using them.",
-                'TS2571': "- Use type assertions (as Type) only when you're certain about the type.",
-            },
-            'syntax_error': {
-                'default': "- Review syntax carefully and use proper linting tools to catch errors early."
-            },
-            'type_error': {
-                'default': "- Add type checking and validation for function parameters and return values."
-            },
-            'eslint_error': {
-                'default': "- Follow ESLint rules consistently and configure auto-fix for common issues."
-            },
-            'npm_error': {
-                'default': "- Clear npm cache and node_modules when encountering persistent package issues."
-            },
-            'test_failure': {
-                'default': "- Review test assertions and ensure test data matches expected formats."
-            },
-            'module_not_found': {
-                'default': "- Verify import paths are correct and all dependencies are installed."
-            },
-            'permission_error': {
-                'default': "- Check file permissions and ensure the user has appropriate access rights."
-            }
-        }
+        # Higher confidence with more occurrences; skip rules that would be filtered
+        confidence = min(0.9, count / 10.0)
+        if confidence < self.confidence_threshold:
+            return None
         
         # Extract specific error code or use default
         error_code = None
-        if error_type == 'typescript_error':
-            ts_match = re.search(r'TS(\d+)', message)
-            if ts_match:
-                error_code = f"TS{ts_match.group(1)}"
+        extractor = _CODE_EXTRACTORS.get(error_type)
+        if extractor is not None:
+            code_match = extractor.search(message)
+            if code_match:
+                error_code = code_match.group(0)
         
         # Get rule template
-        template_group = rule_templates.get(error_type, {})
+        template_group = _RULE_TEMPLATES.get(error_type, _EMPTY)
         rule_text = template_group.get(error_code) or template_group.get('default')
         
         if rule_text:
-            return {
-                'type': 'error_prevention',
-                'category': error_type.replace('_', ' ').title(),
-                'rule': rule_text,
-                'evidence': {
-                    'error_type': error_type,
-                    'message': message[:100],  # Truncate long messages
-                    'occurrences': count
-                },
-                'confidence': min(0.9, count / 10.0),  # Higher confidence with more occurrences
-                'timestamp': datetime.now().isoformat()
-            }
+            return self._make_rule('error_prevention', error_type.replace('_', ' ').title(), rule_text, {
+                'error_type': error_type,
+                'message': message[:100],  # Truncate long messages
+                'occurrences': count
+            }, confidence)
         
         return None
     
@@ -134,80 +237,40 @@ class RuleGenerator:
     
     def _generate_workflow_rule(self, command: str, count: int, conversations: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Generate workflow rules based on command usage."""
-        workflow_templates = {
-            '/test': "- Run tests frequently during development to catch issues early.",
-            '/review': "- Use code review commands to maintain quality standards.",
-            '/build': "- Build the project after significant changes to verify compilation.",
-            '/lint': "- Run linting before committing code to maintain consistency.",
-            '/format': "- Apply consistent formatting across the codebase.",
-            '/docs': "- Keep documentation updated alongside code changes.",
-            '/deploy': "- Follow deployment procedures and verify in staging first.",
-            '/debug': "- Use systematic debugging approaches to isolate issues.",
-            '/optimize': "- Profile before optimizing to identify actual bottlenecks.",
-            '/refactor': "- Refactor in small, testable increments.",
-        }
+        confidence = min(0.8, count / 20.0)
+        if confidence < self.confidence_threshold:
+            return None
         
-        rule_text = workflow_templates.get(command)
+        rule_text = _WORKFLOW_TEMPLATES.get(command)
         if rule_text:
-            return {
-                'type': 'workflow',
-                'category': 'Development Process',
-                'rule': rule_text,
-                'evidence': {
-                    'command': command,
-                    'usage_count': count
-                },
-                'confidence': min(0.8, count / 20.0),
-                'timestamp': datetime.now().isoformat()
-            }
+            return self._make_rule('workflow', 'Development Process', rule_text, {
+                'command': command,
+                'usage_count': count
+            }, confidence)
         
         return None
     
     def _generate_file_pattern_rule(self, file_types: Dict[str, int]) -> Optional[Dict[str, Any]]:
         """Generate rules based on file type patterns."""
+        confidence = 0.8
+        if confidence < self.confidence_threshold:
+            return None
+        
         total_changes = sum(file_types.values())
         if total_changes < 5:
             return None
         
-        # Identify dominant file types
-        dominant_types = {k: v for k, v in file_types.items() if v / total_changes > 0.3}
+        # Identify dominant file types (more than 30% of changes), in integer math
+        threshold = 3 * total_changes
+        dominant_types = {k: v for k, v in file_types.items() if v * 10 > threshold}
         
-        if '.ts' in dominant_types or '.tsx' in dominant_types:
-            return {
-                'type': 'technology_specific',
-                'category': 'TypeScript',
-                'rule': "- Use strict TypeScript configuration and enable all recommended compiler options.",
-                'evidence': {
+        # First technology in priority order with a dominant extension wins
+        for extensions, category, rule_text in _FILE_EXT_RULES:
+            if not dominant_types.keys().isdisjoint(extensions):
+                return self._make_rule('technology_specific', category, rule_text, {
                     'file_types': dominant_types,
                     'total_changes': total_changes
-                },
-                'confidence': 0.8,
-                'timestamp': datetime.now().isoformat()
-            }
-        elif '.py' in dominant_types:
-            return {
-                'type': 'technology_specific',
-                'category': 'Python',
-                'rule': "- Follow PEP 8 style guidelines and use type hints for better code clarity.",
-                'evidence': {
-                    'file_types': dominant_types,
-                    'total_changes': total_changes
-                },
-                'confidence': 0.8,
-                'timestamp': datetime.now().isoformat()
-            }
-        elif '.js' in dominant_types or '.jsx' in dominant_types:
-            return {
-                'type': 'technology_specific',
-                'category': 'JavaScript',
-                'rule': "- Use ESLint and Prettier for consistent code formatting and quality.",
-                'evidence': {
-                    'file_types': dominant_types,
-                    'total_changes': total_changes
-                },
-                'confidence': 0.8,
-                'timestamp': datetime.now().isoformat()
-            }
+                }, confidence)
         
         return None
     
@@ -217,23 +280,13 @@ class RuleGenerator:
         if not patterns:
             return []
         
-        rules = []
-        
-        # Generate error-based rules
-        error_rules = self.analyze_error_patterns(patterns)
-        rules.extend(error_rules)
-        
-        # Generate workflow rules
-        workflow_rules = self.analyze_command_patterns(patterns)
-        rules.extend(workflow_rules)
+        self._now_iso = datetime.now().isoformat()
         
-        # Filter by confidence threshold
-        high_confidence_rules = [
-            rule for rule in rules 
-            if rule.get('confidence', 0) >= self.confidence_threshold
-        ]
+        # Rule generators already drop anything below the confidence threshold
+        rules = self.analyze_error_patterns(patterns)
+        rules.extend(self.analyze_command_patterns(patterns))
         
-        return high_confidence_rules
+        return rules
     
     def format_rules_for_markdown(self, rules: List[Dict[str, Any]]) -> str:
         """Format rules as markdown for insertion into CLAUDE.md."""
@@ -245,10 +298,7 @@ class RuleGenerator:
         # Group rules by category
         categories = {}
         for rule in rules:
-            category = rule.get('category', 'General')
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(rule)
+            categories.setdefault(rule.get('category', 'General'), []).append(rule)
         
         # Format each category
         for category, category_rules in categories.items():
@@ -257,69 +307,48 @@ class RuleGenerator:
             for rule in category_rules:
                 rule_text = rule.get('rule', '')
                 confidence = rule.get('confidence', 0)
-                occurrences = rule.get('evidence', {}).get('occurrences', 0) or rule.get('evidence', {}).get('usage_count', 0)
-                
-                formatted.append(rule_text)
+                evidence = rule.get('evidence') or _EMPTY
+                occurrences = evidence.get('occurrences') or evidence.get('usage_count') or 0
                 
                 if occurrences > 0:
-                    formatted.append(f"  *Generated from {occurrences} occurrences (confidence: {confidence:.1%})*")
+                    footer = f"  *Generated from {occurrences} occurrences (confidence: {confidence:.1%})*"
                 else:
-                    formatted.append(f"  *Confidence: {confidence:.1%}*")
+                    footer = f"  *Confidence: {confidence:.1%}*"
                 
-                formatted.append("")  # Empty line
+                # Rule, footer, then an empty line
+                formatted.extend((rule_text, footer, ""))
         
-        formatted.append(f"\n*Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*")
-        formatted.append(f"*Generated by RuleCrafter - {len(rules)} adaptive rules*")
+        formatted.extend((
+            f"\n*Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*",
+            f"*Generated by RuleCrafter - {len(rules)} adaptive rules*",
+        ))
         
         return "\n".join(formatted)
     
     def update_claude_md(self, rules: List[Dict[str, Any]]) -> bool:
-        """Update CLAUDE.md with new rules."""
-        try:
-            # Read existing CLAUDE.md or create if it doesn't exist
-            if self.claude_md.exists():
-                with open(self.claude_md, 'r') as f:
-                    content = f.read()
-            else:
-                content = self._create_initial_claude_md()
-            
-            # Find the RuleCrafter section
-            section_start = "## RuleCrafter Adaptive Rules"
-            section_end = "---"
-            
-            start_idx = content.find(section_start)
-            if start_idx == -1:
-                # Add the section at the end
-                content += f"\n\n{section_start}\n\n"
-                content += self.format_rules_for_markdown(rules)
-                content += f"\n\n{section_end}\n"
-            else:
-                # Find the end of the section
-                end_search_start = start_idx + len(section_start)
-                end_idx = content.find(section_end, end_search_start)
-                
-                if end_idx == -1:
-                    # No end marker found, replace to end of file
-                    new_content = content[:start_idx] + section_start + "\n\n"
-                    new_content += self.format_rules_for_markdown(rules)
-                    new_content += f"\n\n{section_end}\n"
-                else:
-                    # Replace the section content
-                    new_content = content[:start_idx] + section_start + "\n\n"
-                    new_content += self.format_rules_for_markdown(rules)
-                    new_content += f"\n\n{content[end_idx:]}"
-                
-                content = new_content
-            
-            # Write updated content
-            with open(self.claude_md, 'w') as f:
-                f.write(content)
-            
-            return True
-            
-        except OSError as e:
-            print(f"Error updating CLAUDE.md: {e}", file=sys.stderr)
-            return False
+        """Update CLAUDE.md with new rules. The write itself may be deferred; see flush()."""
+        return self._stage_claude_md(rules) and self.flush()
+    
+    def _stage_claude_md(self, rules: List[Dict[str, Any]]) -> bool:
+        """Buffer the formatted rules section for CLAUDE.md, without writing it."""
+        self._claude_md_section = self.format_rules_for_markdown(rules)
+        self._dirty = True
+        return True
+    
+    def _splice_section(self, content: str, section: str) -> str:
+        """Return content with the RuleCrafter section replaced by section."""
+        # Replace the RuleCrafter section in one pass; it runs up to the next
+        # "---", or to the end of the file, in which case the marker is restored
+        new_content, replaced = _SECTION_RE.subn(
+            lambda match: (f"{_SECTION_START}\n\n{section}\n\n"
+                           if match.end() < len(match.string) else
+                           f"{_SECTION_START}\n\n{section}\n\n{_SECTION_END}\n"),
+            content, count=1
+        )
+        if not replaced:
+            # Add the section at the end
+            new_content += f"\n\n{_SECTION_START}\n\n{section}\n\n{_SECTION_END}\n"
+        return new_content
     
     def _create_initial_claude_md(self) -> str:
         """Create initial CLAUDE.md content."""
@@ -351,33 +380,78 @@ This file contains project-specific information, coding standards, and preferenc
 *Generated by RuleCrafter*
 """
     
+    def _load_pending(self) -> List[Dict[str, Any]]:
+        """Read the pending rules from pending_rules.json, or an empty list."""
+        if self.pending_file.exists():
+            return _loads(self.pending_file.read_bytes())
+        return []
+    
     def save_pending_rules(self, rules: List[Dict[str, Any]]) -> bool:
-        """Save rules that need user approval."""
+        """Save rules that need user approval. The write itself may be deferred; see flush()."""
+        return self._stage_pending_rules(rules) and self.flush()
+    
+    def _stage_pending_rules(self, rules: List[Dict[str, Any]]) -> bool:
+        """Queue rules for pending_rules.json with approval status, without writing it."""
+        generated_at = datetime.now().isoformat()
+        for rule in rules:
+            rule['status'] = 'pending'
+            rule['generated_at'] = generated_at
+        
+        self._pending_rules.extend(rules)
+        self._dirty = True
+        return True
+    
+    def _write_claude_md(self, section: str) -> bool:
+        """Splice section into CLAUDE.md as it is on disk now, reporting any error."""
         try:
-            pending_file = self.rulecrafter_dir / 'storage' / 'pending_rules.json'
-            
-            # Load existing pending rules
-            if pending_file.exists():
-                with open(pending_file, 'r') as f:
-                    existing_rules = json.load(f)
+            # Read at write time, so a deferred write never overwrites changes
+            # made to the file since the section was staged
+            if self.claude_md.exists():
+                content = self.claude_md.read_text()
             else:
-                existing_rules = []
-            
-            # Add new rules with approval status
-            for rule in rules:
-                rule['status'] = 'pending'
-                rule['generated_at'] = datetime.now().isoformat()
-                existing_rules.append(rule)
-            
-            # Save updated pending rules
-            with open(pending_file, 'w') as f:
-                json.dump(existing_rules, f, indent=2)
-            
-            return True
+                content = self._create_initial_claude_md()
             
+            new_content = self._splice_section(content, section)
+            if new_content != content:  # Leave an unchanged file alone
+                self.claude_md.write_text(new_content)
+        except OSError as e:
+            print(f"Error updating CLAUDE.md: {e}", file=sys.stderr)
+            return False
+        return True
+    
+    def _write_pending(self, rules: List[Dict[str, Any]]) -> bool:
+        """Append rules to pending_rules.json as it is on disk now, reporting any error."""
+        try:
+            # Read at write time, so a deferred write keeps rules added or
+            # reviewed since they were staged
+            existing_rules = self._load_pending()
+            existing_rules.extend(rules)
+            self.pending_file.write_bytes(_dumps(existing_rules, indent=True))
         except OSError as e:
             print(f"Error saving pending rules: {e}", file=sys.stderr)
             return False
+        return True
+    
+    def flush(self, force: bool = False) -> bool:
+        """Write buffered CLAUDE.md and pending rules, at most once per flush_interval unless forced."""
+        if not self._dirty:
+            return True
+        if not force and time.monotonic() - self._last_flush < self.flush_interval:
+            return True  # Deferred to a later flush or to exit
+        
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        claude_md_section = self._claude_md_section
+        pending_rules = self._pending_rules
+        self._claude_md_section = None
+        self._pending_rules = []
+        
+        success = True
+        if claude_md_section is not None:
+            success = self._write_claude_md(claude_md_section)
+        if pending_rules:
+            success = self._write_pending(pending_rules) and success
+        return success
     
     def generate_and_update_rules(self, auto_approve: bool = False) -> Tuple[int, int]:
         """Generate rules and update CLAUDE.md. Returns (generated_count, approved_count)."""
@@ -388,15 +462,19 @@ This file contains project-specific information, coding standards, and preferenc
         
         if auto_approve:
             # Auto-approve high-confidence rules
-            approved_rules = [rule for rule in rules if rule.get('confidence', 0) >= 0.9]
-            pending_rules = [rule for rule in rules if rule.get('confidence', 0) < 0.9]
+            approved_rules = []
+            pending_rules = []
+            for rule in rules:
+                (approved_rules if rule.get('confidence', 0) >= 0.9 else pending_rules).append(rule)
             
+            # Stage both updates so a single flush writes the two files
             if approved_rules:
-                self.update_claude_md(approved_rules)
+                self._stage_claude_md(approved_rules)
             
             if pending_rules:
-                self.save_pending_rules(pending_rules)
+                self._stage_pending_rules(pending_rules)
             
+            self.flush()
             return len(rules), len(approved_rules)
         else:
             # Save all rules as pending
@@ -422,7 +500,7 @@ def main():
         'timestamp': datetime.now().isoformat()
     }
     
-    print(json.dumps(result, indent=2))
+    print(_dumps(result, indent=True).decode('utf-8'))
 
 if __name__ == "__main__":
     main()
@@ -35,14 +35,21 @@ fi
 
 # Check if it's time to run learning (every 10 tool uses)
 PATTERNS_FILE="$RULECRAFTER_DIR/storage/patterns.json"
+EVENTS_FILE="$RULECRAFTER_DIR/storage/patterns.jsonl"
 if [[ -f "$PATTERNS_FILE" ]]; then
-    # Count total sessions
+    # Count total sessions (compacted ones plus events still in the log)
     TOTAL_SESSIONS=$(python3 -c "
 import json
 try:
     with open('$PATTERNS_FILE', 'r') as f:
         data = json.load(f)
-    print(data.get('total_sessions', 0))
+    total = data.get('total_sessions', 0)
+    try:
+        with open('$EVENTS_FILE', 'rb') as f:
+            total += f.read().count(b'\\n')
+    except OSError:
+        pass
+    print(total)
 except:
     print(0)
 " 2>/dev/null || echo "0")
@@ -51,6 +58,14 @@ except:
     if (( TOTAL_SESSIONS > 0 && TOTAL_SESSIONS % 10 == 0 )); then
         echo "🧠 RuleCrafter: Running pattern analysis (session $TOTAL_SESSIONS)..."
         
+        # Fold pending events into patterns.json before generating
+        if command -v python3 &> /dev/null; then
+            python3 "$RULECRAFTER_DIR/analyzers/context_analyzer.py" \
+                "$PROJECT_ROOT" \
+                --compact \
+                > /dev/null 2>&1 || true
+        fi
+        
         # Run rule generation
         if command -v python3 &> /dev/null; then
             python3 "$RULECRAFTER_DIR/generators/rule_generator.py" \
@@ -51,6 +51,12 @@ echo "🧠 RuleCrafter: Session ended, running analysis..."
 
 # Generate rules and commands
 if command -v python3 &> /dev/null; then
+    # Fold pending events into patterns.json before generating
+    python3 "$RULECRAFTER_DIR/analyzers/context_analyzer.py" \
+        "$PROJECT_ROOT" \
+        --compact \
+        > /dev/null 2>&1 || true
+    
     # Generate rules with auto-approval for high-confidence items
     RULE_RESULT=$(python3 "$RULECRAFTER_DIR/generators/rule_generator.py" \
         "$PROJECT_ROOT" \